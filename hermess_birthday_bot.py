@@ -6,10 +6,20 @@ Extrae la información de cumpleaños de los pacientes y la guarda en formato n8
 """
 
 import os
+import re
 import json
+import queue
+import atexit
+import logging
+import logging.handlers
+import calendar
+import sys
 import time
+import cProfile
+import threading
 import requests
 from datetime import datetime
+from urllib.parse import urlparse
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -20,6 +30,555 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from webdriver_manager.chrome import ChromeDriverManager
 from dotenv import load_dotenv
 
+logger = logging.getLogger("hermess_birthday_bot")
+
+# La traza de comandos WebDriver tiene su propio nivel (HERMESS_TRACE), independiente de HERMESS_LOG_LEVEL
+trace_logger = logging.getLogger("hermess_birthday_bot.trace")
+
+# Campos estructurados de los eventos de log que contienen datos de pacientes
+PII_FIELDS = ("nombre", "celular", "email")
+
+# Campos de texto libre (errores, respuestas, texto de la página) que pueden contener datos de pacientes
+FREE_TEXT_FIELDS = ("error", "respuesta", "texto")
+
+_EMAIL_RE = re.compile(r"([A-Za-z0-9._%+-])[A-Za-z0-9._%+-]*@([A-Za-z0-9-]+\.[A-Za-z0-9.-]+)")
+# Solo números con forma de celular (10 dígitos, con o sin indicativo +57 y separadores),
+# nunca dentro de URLs o identificadores
+_PHONE_RE = re.compile(r"(?<![\w/.=+-])(?:\+?57[ -]?)?\d{3}[ -]?\d{3}[ -]?\d{4}(?![\w/-])")
+_LOG_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_log_listener = None
+
+
+def redact_text(text):
+    """Oculta correos y números de teléfono dentro de un texto libre"""
+    text = _EMAIL_RE.sub(r"\1***@\2", text)
+    return _PHONE_RE.sub(lambda m: "********" + m.group()[-2:], text)
+
+
+def redact_value(field, value):
+    """Oculta el valor de un campo con datos de pacientes"""
+    value = str(value)
+    if not value:
+        return value
+    if field == "nombre":
+        # Solo las iniciales: suficiente para depurar sin exponer al paciente
+        return " ".join(f"{palabra[0]}." for palabra in value.split())
+    if field == "celular":
+        return "*" * max(len(value) - 2, 0) + value[-2:]
+    return redact_text(value)
+
+
+class PiiRedactionFilter(logging.Filter):
+    """Filtro que oculta los datos de pacientes antes de escribir cada evento"""
+    
+    def filter(self, record):
+        record.msg = redact_text(str(record.msg))
+        for field in PII_FIELDS:
+            if hasattr(record, field):
+                setattr(record, field, redact_value(field, getattr(record, field)))
+        for field in FREE_TEXT_FIELDS:
+            if hasattr(record, field):
+                setattr(record, field, redact_text(str(getattr(record, field))))
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Escribe cada evento como una línea JSON con nivel, evento y campos adicionales"""
+    
+    def format(self, record):
+        data = {
+            "fecha": datetime.fromtimestamp(record.created).isoformat(),
+            "nivel": record.levelname,
+            "evento": getattr(record, "evento", record.funcName),
+            "mensaje": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _LOG_RECORD_FIELDS:
+                data[key] = value
+        
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def setup_logging():
+    """Configura el logger JSON con un handler en cola que no bloquea la extracción"""
+    global _log_listener
+    if _log_listener:
+        return
+    
+    load_dotenv('config.env')
+    level = logging.getLevelName(os.getenv('HERMESS_LOG_LEVEL', 'INFO').upper())
+    if not isinstance(level, int):
+        level = logging.INFO
+    
+    # La escritura (redacción, JSON y stdout) ocurre en el hilo del QueueListener
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    handler.addFilter(PiiRedactionFilter())
+    
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(level)
+    logger.propagate = False
+    
+    _log_listener = logging.handlers.QueueListener(log_queue, handler)
+    _log_listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Vacía la cola de logs y detiene el hilo de escritura"""
+    global _log_listener
+    if _log_listener:
+        _log_listener.stop()
+        _log_listener = None
+
+
+# Estados de navegación: describen la página que está cargada en el navegador
+ESTADO_DESCONOCIDO = "desconocido"
+ESTADO_LOGIN = "login"
+ESTADO_AUTENTICADO = "autenticado"
+ESTADO_CUMPLEANOS = "cumpleanos"
+
+# Elementos que solo aparecen cuando estamos logueados
+LOGGED_IN_INDICATORS = [
+    "//a[contains(@href, 'logout') or contains(text(), 'Cerrar') or contains(text(), 'Logout')]",
+    "//button[contains(text(), 'Cerrar') or contains(text(), 'Logout')]",
+    "//*[contains(@class, 'user') or contains(@class, 'profile') or contains(@class, 'dashboard')]",
+    # Formularios de datos (que solo aparecen logueados)
+    "//table",
+    "//*[contains(text(), 'cumpleaños') or contains(text(), 'pacientes')]"
+]
+
+# Elementos de la página de login
+LOGIN_INDICATORS = [
+    "//form[contains(@action, 'login')]",
+    "//input[@name='email']",
+    "//input[@name='password']",
+    "//button[contains(text(), 'Iniciar') or contains(text(), 'Login')]"
+]
+
+# Tablas de búsqueda DD/MM -> YYYY-MM-DD por año, construidas una sola vez
+_DATE_TABLES = {}
+
+
+def build_date_table(year):
+    """Construye la tabla de pares día/mes válidos del año (acepta '1/2' y '01/02')"""
+    table = _DATE_TABLES.get(year)
+    if table is not None:
+        return table
+    
+    table = {}
+    for mes in range(1, 13):
+        for dia in range(1, calendar.monthrange(year, mes)[1] + 1):
+            fecha_iso = f"{year:04d}-{mes:02d}-{dia:02d}"
+            for texto_dia in (str(dia), f"{dia:02d}"):
+                for texto_mes in (str(mes), f"{mes:02d}"):
+                    table[f"{texto_dia}/{texto_mes}"] = fecha_iso
+    
+    _DATE_TABLES[year] = table
+    return table
+
+
+def normalize_birthday_dates(fechas, year=None):
+    """Convierte una columna completa de fechas DD/MM a YYYY-MM-DD en una sola pasada
+    
+    Usa el año indicado (por defecto el de ejecución); las fechas inválidas se conservan
+    tal cual. Devuelve la columna normalizada y los índices de las filas inválidas.
+    """
+    table = build_date_table(year or datetime.now().year)
+    
+    # La tabla ya contiene todos los pares válidos: una búsqueda por fila, sin datetime
+    fechas_norm = [table.get(fecha, fecha) for fecha in fechas]
+    fechas_invalidas = [i for i, fecha in enumerate(fechas) if fecha not in table]
+    return fechas_norm, fechas_invalidas
+
+
+class WebDriverCommandTracer:
+    """Envuelve el command executor del driver para registrar cada comando WebDriver"""
+    
+    def __init__(self, executor, verbose=True):
+        self.executor = executor
+        self.original_execute = executor.execute
+        self.verbose = verbose
+        self.stats = {}
+        
+    def install(self):
+        """Reemplaza el método execute del executor por la versión instrumentada"""
+        self.executor.execute = self._execute
+        
+    def _execute(self, command, params):
+        inicio = time.perf_counter()
+        response = None
+        try:
+            response = self.original_execute(command, params)
+            return response
+        finally:
+            duracion = time.perf_counter() - inicio
+            self._record(command, params or {}, response, duracion)
+    
+    def _record(self, command, params, response, duracion):
+        """Registra nombre, selector, duración y tamaño de carga de un comando"""
+        selector = f"{params.get('using')}={params.get('value')}" if 'using' in params else ""
+        bytes_enviados = len(json.dumps(params, default=str))
+        bytes_recibidos = len(json.dumps(response, default=str)) if response is not None else 0
+        
+        stat = self.stats.setdefault(command, {"llamadas": 0, "tiempo": 0.0, "bytes": 0})
+        stat["llamadas"] += 1
+        stat["tiempo"] += duracion
+        stat["bytes"] += bytes_enviados + bytes_recibidos
+        
+        # La traza se activa con HERMESS_TRACE, independiente del nivel de log
+        if self.verbose:
+            trace_logger.info("Comando WebDriver", extra={
+                "evento": "traza_comando",
+                "comando": command,
+                "selector": selector,
+                "duracion_ms": round(duracion * 1000, 1),
+                "bytes_enviados": bytes_enviados,
+                "bytes_recibidos": bytes_recibidos
+            })
+    
+    def log_summary(self):
+        """Registra el resumen de comandos ordenado por tiempo total"""
+        total_llamadas = sum(stat["llamadas"] for stat in self.stats.values())
+        total_tiempo = sum(stat["tiempo"] for stat in self.stats.values())
+        trace_logger.info("Resumen de comandos WebDriver", extra={"evento": "traza_resumen", "comandos": total_llamadas, "duracion_s": round(total_tiempo, 2)})
+        for command, stat in sorted(self.stats.items(), key=lambda item: item[1]["tiempo"], reverse=True):
+            trace_logger.info("Resumen por comando", extra={
+                "evento": "traza_resumen_comando",
+                "comando": command,
+                "llamadas": stat["llamadas"],
+                "duracion_ms": round(stat["tiempo"] * 1000, 1),
+                "bytes": stat["bytes"]
+            })
+
+
+class SamplingProfiler:
+    """Profiler por muestreo que escribe pilas en formato 'folded' para flame graphs"""
+    
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = {}
+        self._target_thread = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = None
+        
+    def start(self):
+        self._thread = threading.Thread(target=self._sample_loop, daemon=True)
+        self._thread.start()
+        
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+    
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target_thread)
+            if frame is None:
+                continue
+            
+            # Construir la pila desde la raíz hasta el frame actual
+            pila = []
+            while frame is not None:
+                codigo = frame.f_code
+                pila.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            clave = ";".join(reversed(pila))
+            self.samples[clave] = self.samples.get(clave, 0) + 1
+    
+    def write(self, output_path):
+        """Escribe las muestras en formato folded (flamegraph.pl, speedscope)"""
+        with open(output_path, 'w', encoding='utf-8') as f:
+            for pila, cantidad in sorted(self.samples.items()):
+                f.write(f"{pila} {cantidad}\n")
+
+
+def run_with_profiler(func, mode, output_path=None):
+    """Ejecuta func bajo cProfile o el profiler por muestreo y guarda el resultado"""
+    if mode == "cprofile":
+        output_path = output_path or "hermess_profile.prof"
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func)
+        finally:
+            profiler.dump_stats(output_path)
+            logger.info("Perfil cProfile guardado", extra={"evento": "perfil_guardado", "archivo": output_path})
+    
+    if mode == "sampling":
+        output_path = output_path or "hermess_profile.folded"
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            return func()
+        finally:
+            profiler.stop()
+            profiler.write(output_path)
+            logger.info("Pilas muestreadas guardadas", extra={"evento": "perfil_guardado", "archivo": output_path})
+    
+    logger.warning("Modo de profiling desconocido, ejecutando sin profiler", extra={"evento": "perfil_desconocido", "modo": mode})
+    return func()
+
+
+class Cassette:
+    """Grabación de las páginas y peticiones HTTP de una ejecución real del bot"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.recorded_at = datetime.now()
+        self.pages = []
+        self.webhooks = []
+        self._webhook_cursor = 0
+        
+    @classmethod
+    def load(cls, path):
+        """Carga una grabación existente desde disco"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        cassette = cls(path)
+        if data.get("fecha_grabacion"):
+            cassette.recorded_at = datetime.fromisoformat(data["fecha_grabacion"])
+        cassette.pages = data.get("paginas", [])
+        cassette.webhooks = data.get("webhooks", [])
+        return cassette
+    
+    def save(self):
+        """Guarda la grabación en disco"""
+        data = {
+            "version": 1,
+            "fecha_grabacion": self.recorded_at.isoformat(),
+            "paginas": self.pages,
+            "webhooks": self.webhooks
+        }
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        logger.info("Grabación guardada", extra={
+            "evento": "cassette_guardado",
+            "archivo": self.path,
+            "paginas": len(self.pages),
+            "webhooks": len(self.webhooks)
+        })
+    
+    def record_page(self, evento, url, driver):
+        """Guarda una instantánea de la página cargada ('get' o 'submit')"""
+        self.pages.append({
+            "evento": evento,
+            "url": url,
+            "current_url": driver.current_url,
+            "title": driver.title,
+            "source": driver.page_source
+        })
+    
+    def record_webhook(self, url, payload, response):
+        """Guarda una petición POST al webhook y su respuesta"""
+        self.webhooks.append({
+            "url": url,
+            "payload": payload,
+            "status_code": response.status_code,
+            "response": response.text
+        })
+    
+    def replay_webhook(self, payload):
+        """Devuelve la respuesta grabada del webhook y compara los datos enviados"""
+        if self._webhook_cursor >= len(self.webhooks):
+            logger.info("No hay petición al webhook grabada, se asume respuesta 200", extra={"evento": "cassette_sin_webhook"})
+            return ReplayResponse(200, "")
+        
+        exchange = self.webhooks[self._webhook_cursor]
+        self._webhook_cursor += 1
+        
+        grabados = exchange["payload"].get("cumpleanos", [])
+        actuales = payload.get("cumpleanos", [])
+        if grabados == actuales:
+            logger.info("Datos idénticos a la grabación", extra={"evento": "cassette_comparacion", "registros": len(actuales), "diferentes": 0})
+        else:
+            diferentes = sum(1 for a, b in zip(grabados, actuales) if a != b) + abs(len(grabados) - len(actuales))
+            logger.info("Los datos difieren de la grabación", extra={
+                "evento": "cassette_comparacion",
+                "diferentes": diferentes,
+                "grabados": len(grabados),
+                "actuales": len(actuales)
+            })
+        
+        return ReplayResponse(exchange["status_code"], exchange["response"])
+
+
+class ReplayResponse:
+    """Respuesta HTTP reproducida desde una grabación"""
+    
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+
+
+# Etiquetas que WebDriver no incluye en el texto visible
+_INVISIBLE_TAGS = {"head", "script", "style", "noscript", "template", "title", "meta", "link"}
+
+# Etiquetas de bloque: WebDriver separa su texto con saltos de línea
+_BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "fieldset",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header",
+    "hr", "li", "main", "nav", "ol", "p", "pre", "section", "table", "tbody", "tfoot",
+    "thead", "tr", "ul", "caption"
+}
+
+
+def _is_hidden(node):
+    """Verifica si un nodo no se muestra (etiqueta invisible, atributo hidden o display:none)"""
+    if not isinstance(node.tag, str) or node.tag in _INVISIBLE_TAGS:
+        return True
+    if node.get("hidden") is not None:
+        return True
+    if node.tag == "input" and node.get("type") == "hidden":
+        return True
+    style = node.get("style", "").replace(" ", "").lower()
+    return "display:none" in style or "visibility:hidden" in style
+
+
+def _visible_text(node):
+    """Aproxima el texto visible de WebDriver (.text) para un nodo de lxml"""
+    if _is_hidden(node) or any(_is_hidden(ancestor) for ancestor in node.iterancestors()):
+        return ""
+    
+    partes = []
+    
+    def recorrer(element):
+        if not _is_hidden(element):
+            bloque = element.tag in _BLOCK_TAGS
+            if bloque:
+                partes.append("\n")
+            if element.text:
+                partes.append(element.text)
+            for child in element:
+                recorrer(child)
+                if child.tail:
+                    partes.append(child.tail)
+            if bloque:
+                partes.append("\n")
+            elif element.tag in ("td", "th"):
+                partes.append(" ")
+    
+    recorrer(node)
+    
+    # Como WebDriver: espacios colapsados por línea y sin líneas vacías
+    lineas = (" ".join(linea.split()) for linea in "".join(partes).split("\n"))
+    return "\n".join(linea for linea in lineas if linea)
+
+
+class ReplayElement:
+    """Elemento de una página grabada con la parte de la interfaz de WebElement que usa el bot"""
+    
+    def __init__(self, driver, node):
+        self._driver = driver
+        self._node = node
+        
+    @property
+    def text(self):
+        return _visible_text(self._node)
+    
+    @property
+    def tag_name(self):
+        return self._node.tag
+    
+    def find_elements(self, by, value):
+        return self._driver._find(by, value, self._node)
+    
+    def find_element(self, by, value):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(f"Elemento no encontrado en la grabación: {value}")
+        return elements[0]
+    
+    def clear(self):
+        pass
+    
+    def send_keys(self, *value):
+        pass
+    
+    def click(self):
+        # Enviar un formulario avanza a la siguiente página grabada tras el envío
+        if self._node.get('type') == 'submit':
+            self._driver._submit()
+
+
+class ReplayDriver:
+    """Driver que reproduce las páginas de una grabación sin acceder a HermessApp"""
+    
+    def __init__(self, cassette):
+        try:
+            import lxml.html
+            from cssselect import HTMLTranslator
+        except ImportError:
+            raise Exception("El modo replay necesita lxml y cssselect: pip install lxml cssselect")
+        
+        self._lxml_html = lxml.html
+        self._css = HTMLTranslator()
+        self.cassette = cassette
+        self._cursor = 0
+        self._root = None
+        self.current_url = "about:blank"
+        self.title = ""
+        self.page_source = ""
+        
+    def _show(self, page):
+        self.current_url = page["current_url"]
+        self.title = page["title"]
+        self.page_source = page["source"]
+        self._root = self._lxml_html.document_fromstring(page["source"])
+    
+    def _next(self, evento, url=None):
+        """Busca la siguiente instantánea grabada para el evento a partir del cursor"""
+        pages = self.cassette.pages
+        for idx in range(self._cursor, len(pages)):
+            if pages[idx]["evento"] == evento and (url is None or pages[idx]["url"] == url):
+                self._cursor = idx + 1
+                return pages[idx]
+        
+        # Reutilizar la última instantánea de la URL si se vuelve a cargar
+        for page in reversed(pages):
+            if page["evento"] == evento and (url is None or page["url"] == url):
+                return page
+        
+        raise Exception(f"La grabación no contiene una página para '{evento}' {url or ''}")
+    
+    def get(self, url):
+        self._show(self._next("get", url))
+    
+    def _submit(self):
+        self._show(self._next("submit"))
+    
+    def _find(self, by, value, context):
+        if by == By.XPATH:
+            nodes = context.xpath(value)
+        elif by == By.CSS_SELECTOR:
+            # Selenium no incluye el propio elemento al buscar dentro de él
+            prefix = "descendant-or-self::" if context is self._root else "descendant::"
+            nodes = context.xpath(self._css.css_to_xpath(value, prefix=prefix))
+        else:
+            raise ValueError(f"Estrategia de búsqueda no soportada en replay: {by}")
+        
+        return [ReplayElement(self, node) for node in nodes if isinstance(node, self._lxml_html.HtmlElement)]
+    
+    def find_elements(self, by, value):
+        return self._find(by, value, self._root)
+    
+    def find_element(self, by, value):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(f"Elemento no encontrado en la grabación: {value}")
+        return elements[0]
+    
+    def set_page_load_timeout(self, timeout):
+        pass
+    
+    def implicitly_wait(self, timeout):
+        pass
+    
+    def quit(self):
+        pass
+
+
 class HermessBirthdayBot:
     def __init__(self):
         """Inicializa el bot con configuración desde variables de entorno"""
@@ -31,18 +590,47 @@ class HermessBirthdayBot:
         self.birthdays_url = os.getenv('HERMESS_BIRTHDAYS_URL', 'https://hermessapp.com/pacientescumple')
         self.n8n_webhook_url = os.getenv('N8N_WEBHOOK_URL') or os.getenv('n8n_workflow')
         
-        if not self.email or not self.password:
-            raise ValueError("Debes configurar HERMESS_EMAIL y HERMESS_PASSWORD en config.env")
+        # Grabación y reproducción: 'record' guarda la ejecución, 'replay' la reproduce sin red
+        self.cassette_mode = os.getenv('HERMESS_CASSETTE_MODE', '').lower()
+        self.cassette_path = os.getenv('HERMESS_CASSETTE', 'hermess_cassette.json')
+        self.cassette = None
         
-        if not self.n8n_webhook_url:
-            raise ValueError("Debes configurar N8N_WEBHOOK_URL en config.env")
+        # En replay no se accede a HermessApp ni a n8n, las credenciales no son necesarias
+        if self.cassette_mode != 'replay':
+            if not self.email or not self.password:
+                raise ValueError("Debes configurar HERMESS_EMAIL y HERMESS_PASSWORD en config.env")
+            
+            if not self.n8n_webhook_url:
+                raise ValueError("Debes configurar N8N_WEBHOOK_URL en config.env")
+        
+        # Análisis detallado de la página solo bajo demanda
+        self.debug = os.getenv('HERMESS_DEBUG', '').lower() in ('1', 'true', 'yes', 'si')
+        
+        # Profiling opcional: traza de comandos WebDriver y profiler de run()
+        self.trace = os.getenv('HERMESS_TRACE', '').lower() in ('1', 'true', 'yes', 'si')
+        if self.trace:
+            # Los eventos de traza se propagan al handler del bot aunque su nivel sea WARNING o ERROR
+            trace_logger.setLevel(logging.INFO)
+        self.profile_mode = os.getenv('HERMESS_PROFILE', '').lower()
+        self.profile_output = os.getenv('HERMESS_PROFILE_OUTPUT')
+        self.tracer = None
         
         self.driver = None
         self.wait = None
+        self.redirect_wait = None
+        self.page_state = ESTADO_DESCONOCIDO
+        self.page_loads = 0
+        
+        # Nombres que no se pudieron reordenar o formatear (se envían tal cual)
+        self.name_errors = 0
         
     def setup_driver(self):
+        if self.cassette_mode == 'replay':
+            self._setup_replay_driver()
+            return
+        
         try:
-            print("[INFO] Configurando ChromeDriver...")
+            logger.info("Configurando ChromeDriver...", extra={"evento": "navegador_configurando"})
             
             chrome_options = Options()
             
@@ -111,90 +699,141 @@ class HermessBirthdayBot:
                 chrome_binary_path = "/usr/bin/chromium-browser"
                 chromedriver_path = "/usr/bin/chromedriver"
                 chrome_options.binary_location = chrome_binary_path
-                print("[INFO] Detectado Chrome en Alpine Linux")
+                logger.info("Detectado Chrome en Alpine Linux", extra={"evento": "navegador_alpine"})
             
             # Intentar usar webdriver-manager primero
             try:
                 if chromedriver_path:
                     service = Service(chromedriver_path)
-                    print("[START] Iniciando navegador con ChromeDriver de Alpine...")
+                    logger.info("Iniciando navegador con ChromeDriver de Alpine...", extra={"evento": "navegador_iniciando"})
                 else:
                     service = Service(ChromeDriverManager().install())
-                    print("[START] Iniciando navegador Chrome con webdriver-manager...")
+                    logger.info("Iniciando navegador Chrome con webdriver-manager...", extra={"evento": "navegador_iniciando"})
                 
                 self.driver = webdriver.Chrome(service=service, options=chrome_options)
             except Exception as e1:
-                print(f"[WARNING] Error con ChromeDriver configurado: {str(e1)}")
-                print("[INFO] Intentando con ChromeDriver del PATH...")
+                logger.warning("Error con ChromeDriver configurado", extra={"evento": "navegador_error", "error": str(e1)})
+                logger.info("Intentando con ChromeDriver del PATH...", extra={"evento": "navegador_iniciando"})
                 try:
                     self.driver = webdriver.Chrome(options=chrome_options)
                 except Exception as e2:
-                    print(f"[ERROR] Error con ChromeDriver del PATH: {str(e2)}")
+                    logger.error("Error con ChromeDriver del PATH", extra={"evento": "navegador_error", "error": str(e2)})
                     raise Exception(f"No se pudo inicializar ChromeDriver. Errores: {str(e1)} | {str(e2)}")
             
+            # Instrumentar el driver si se pidió la traza de comandos
+            if self.trace:
+                self.tracer = WebDriverCommandTracer(self.driver.command_executor)
+                self.tracer.install()
+                trace_logger.info("Traza de comandos WebDriver activada", extra={"evento": "traza_activada"})
+            
             # Configurar timeouts
             self.driver.set_page_load_timeout(30)
             self.driver.implicitly_wait(10)
             
             self.wait = WebDriverWait(self.driver, 15)
-            print("[OK] Navegador configurado exitosamente")
+            
+            # Espera corta para la redirección tras el login: si falla, no bloquear 15 s
+            self.redirect_wait = WebDriverWait(self.driver, 3)
+            
+            if self.cassette_mode == 'record':
+                self.cassette = Cassette(self.cassette_path)
+                logger.info("Grabando la ejecución", extra={"evento": "cassette_grabando", "archivo": self.cassette_path})
+            
+            logger.info("Navegador configurado exitosamente", extra={"evento": "navegador_configurado"})
+            
+        except Exception as e:
+            logger.error("Error configurando el navegador", extra={"evento": "navegador_error", "error": str(e)})
+            raise
+        
+    def _setup_replay_driver(self):
+        """Configura el driver de reproducción a partir de una grabación"""
+        try:
+            logger.info("Reproduciendo la grabación", extra={"evento": "cassette_reproduciendo", "archivo": self.cassette_path})
+            self.cassette = Cassette.load(self.cassette_path)
+            self.driver = ReplayDriver(self.cassette)
+            
+            # Sin esperas: la página grabada ya está completa
+            self.wait = WebDriverWait(self.driver, 0, poll_frequency=0.001)
+            self.redirect_wait = self.wait
+            logger.info("Driver de reproducción configurado", extra={"evento": "navegador_configurado"})
             
         except Exception as e:
-            print(f"[ERROR] Error configurando el navegador: {str(e)}")
+            logger.error("Error cargando la grabación", extra={"evento": "cassette_error", "error": str(e)})
             raise
+    
+    def _sleep(self, seconds):
+        """Pausa entre acciones; se omite al reproducir una grabación"""
+        if self.cassette_mode != 'replay':
+            time.sleep(seconds)
+    
+    def _load(self, url):
+        """Carga una URL en el navegador y lleva la cuenta de cargas de página"""
+        self.driver.get(url)
+        self.page_loads += 1
+        self.page_state = ESTADO_DESCONOCIDO
+        self._sleep(2)
+        
+        if self.cassette_mode == 'record' and self.cassette:
+            self.cassette.record_page('get', url, self.driver)
+    
+    def _is_birthdays_url(self, url):
+        """Verifica si una URL corresponde a la página de cumpleaños"""
+        try:
+            actual = urlparse(url).path.rstrip('/')
+            esperada = urlparse(self.birthdays_url).path.rstrip('/')
+            return bool(esperada) and actual == esperada
+        except Exception:
+            return False
+    
+    def _detect_page_state(self):
+        """Determina el estado de navegación a partir de la página ya cargada, sin navegar"""
+        try:
+            # Una sola consulta por grupo de indicadores: cada find_elements vacío
+            # espera el implicit wait completo, así que se unen con '|'
+            elements = self.driver.find_elements(By.XPATH, " | ".join(LOGGED_IN_INDICATORS))
+            if elements:
+                if self._is_birthdays_url(self.driver.current_url):
+                    self.page_state = ESTADO_CUMPLEANOS
+                else:
+                    self.page_state = ESTADO_AUTENTICADO
+                return self.page_state
+            
+            elements = self.driver.find_elements(By.XPATH, " | ".join(LOGIN_INDICATORS))
+            if elements:
+                self.page_state = ESTADO_LOGIN
+                return self.page_state
+            
+        except Exception as e:
+            logger.warning("Error detectando el estado de la página", extra={"evento": "sesion_error", "error": str(e)})
         
+        self.page_state = ESTADO_DESCONOCIDO
+        return self.page_state
+    
     def is_logged_in(self):
         """Verifica si ya estamos logueados en HermessApp"""
         try:
-            print("[INFO] Verificando si ya hay una sesión iniciada...")
-            
-            # Navegar a la página principal o de dashboard
-            self.driver.get(self.birthdays_url)
-            time.sleep(2)
-            
-            # Verificar indicadores de que estamos logueados
-            logged_in_indicators = [
-                # Buscar elementos que solo aparecen cuando estamos logueados
-                "//a[contains(@href, 'logout') or contains(text(), 'Cerrar') or contains(text(), 'Logout')]",
-                "//button[contains(text(), 'Cerrar') or contains(text(), 'Logout')]",
-                "//*[contains(@class, 'user') or contains(@class, 'profile') or contains(@class, 'dashboard')]",
-                # Buscar formularios de datos (que solo aparecen logueados)
-                "//table",
-                "//*[contains(text(), 'cumpleaños') or contains(text(), 'pacientes')]"
-            ]
+            logger.info("Verificando si ya hay una sesión iniciada...", extra={"evento": "sesion_verificando"})
             
-            for indicator in logged_in_indicators:
-                try:
-                    elements = self.driver.find_elements(By.XPATH, indicator)
-                    if elements:
-                        print(f"[OK] Sesión ya iniciada - encontrado indicador: {indicator}")
-                        return True
-                except:
-                    continue
+            # Solo navegar si todavía no sabemos en qué página estamos; si no hay
+            # sesión, HermessApp redirige al login y esa página se reutiliza
+            if self.page_state == ESTADO_DESCONOCIDO:
+                self._load(self.birthdays_url)
+                self._detect_page_state()
             
-            # Verificar si estamos en la página de login
-            login_indicators = [
-                "//form[contains(@action, 'login')]",
-                "//input[@name='email']",
-                "//input[@name='password']",
-                "//button[contains(text(), 'Iniciar') or contains(text(), 'Login')]"
-            ]
+            if self.page_state in (ESTADO_AUTENTICADO, ESTADO_CUMPLEANOS):
+                logger.info("Sesión ya iniciada", extra={"evento": "sesion_activa", "estado": self.page_state})
+                return True
             
-            for indicator in login_indicators:
-                try:
-                    elements = self.driver.find_elements(By.XPATH, indicator)
-                    if elements:
-                        print(f"[INFO] No hay sesión iniciada - encontrado formulario de login")
-                        return False
-                except:
-                    continue
+            if self.page_state == ESTADO_LOGIN:
+                logger.info("No hay sesión iniciada - encontrado formulario de login", extra={"evento": "sesion_inactiva"})
+                return False
             
             # Si no encontramos indicadores claros, asumir que no estamos logueados
-            print("[INFO] No se pudo determinar el estado de la sesión, procediendo con login")
+            logger.info("No se pudo determinar el estado de la sesión, procediendo con login", extra={"evento": "sesion_desconocida"})
             return False
             
         except Exception as e:
-            print(f"[WARNING] Error verificando sesión: {str(e)}")
+            logger.warning("Error verificando sesión", extra={"evento": "sesion_error", "error": str(e)})
             return False
 
     def login(self):
@@ -202,17 +841,22 @@ class HermessBirthdayBot:
         try:
             # Primero verificar si ya estamos logueados
             if self.is_logged_in():
-                print("[OK] Sesión ya iniciada, continuando...")
+                logger.info("Sesión ya iniciada, continuando...", extra={"evento": "login_omitido"})
                 return True
             
-            print("[INFO] Iniciando sesión en HermessApp...")
-            self.driver.get(self.login_url)
+            logger.info("Iniciando sesión en HermessApp...", extra={"evento": "login_iniciando"})
+            
+            # Reutilizar el formulario de login si ya estamos en él (redirección)
+            if self.page_state != ESTADO_LOGIN:
+                self._load(self.login_url)
             
             # Esperar a que cargue la página de login
             self.wait.until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, "form[action*='login']"))
             )
             
+            login_page_url = self.driver.current_url
+            
             # Buscar campos de login usando los selectores correctos del HTML
             email_field = self.driver.find_element(By.CSS_SELECTOR, "input[name='email']")
             password_field = self.driver.find_element(By.CSS_SELECTOR, "input[name='password']")
@@ -228,30 +872,40 @@ class HermessBirthdayBot:
             login_button = self.driver.find_element(By.CSS_SELECTOR, "button[type='submit']")
             login_button.click()
             
-            # Esperar a que se complete el login
-            time.sleep(3)
+            # La redirección posterior al login cuenta como la navegación:
+            # esperar a que la URL cambie y analizar la página a la que llegamos
+            try:
+                self.redirect_wait.until(lambda driver: driver.current_url != login_page_url)
+                self.page_loads += 1
+            except TimeoutException:
+                pass
+            
+            if self.cassette_mode == 'record' and self.cassette:
+                self.cassette.record_page('submit', login_page_url, self.driver)
             
             # Verificar que el login fue exitoso
-            if self.is_logged_in():
-                print("[OK] Sesión iniciada exitosamente")
+            if self._detect_page_state() in (ESTADO_AUTENTICADO, ESTADO_CUMPLEANOS):
+                logger.info("Sesión iniciada exitosamente", extra={"evento": "login_exitoso", "estado": self.page_state})
                 return True
             else:
-                print("[ERROR] Login falló - no se pudo verificar la sesión")
+                logger.error("Login falló - no se pudo verificar la sesión", extra={"evento": "login_fallido", "estado": self.page_state})
+                self._debug_page_content()
                 return False
             
         except Exception as e:
-            print(f"[ERROR] Error durante el login: {str(e)}")
+            logger.error("Error durante el login", extra={"evento": "login_error", "error": str(e)})
             return False
     
     def navigate_to_birthdays(self):
         """Navega a la página de cumpleaños"""
         try:
-            print("[INFO] Navegando a la página de cumpleaños...")
-            self.driver.get(self.birthdays_url)
-            time.sleep(3)
-            
-            # Hacer debug para ver qué hay en la página
-            self._debug_page_content()
+            # Reutilizar la página si la redirección ya nos dejó en cumpleaños
+            if self.page_state == ESTADO_CUMPLEANOS:
+                logger.info("Página de cumpleaños ya cargada, reutilizándola", extra={"evento": "pagina_reutilizada"})
+            else:
+                logger.info("Navegando a la página de cumpleaños...", extra={"evento": "pagina_navegando", "url": self.birthdays_url})
+                self._load(self.birthdays_url)
+                self._detect_page_state()
             
             # Esperar a que cargue algún contenido
             try:
@@ -261,58 +915,63 @@ class HermessBirthdayBot:
             except:
                 pass
             
-            print("[OK] Página de cumpleaños cargada")
+            # El análisis de la página solo se hace bajo demanda (HERMESS_DEBUG)
+            if self.debug:
+                self._debug_page_content()
+            
+            logger.info("Página de cumpleaños cargada", extra={"evento": "pagina_cargada", "cargas_de_pagina": self.page_loads})
             return True
             
         except Exception as e:
-            print(f"[ERROR] Error navegando a la página de cumpleaños: {str(e)}")
+            logger.error("Error navegando a la página de cumpleaños", extra={"evento": "pagina_error", "error": str(e)})
+            self._debug_page_content()
             return False
     
     def _debug_page_content(self):
         """Hace debug del contenido de la página para entender su estructura"""
         try:
-            print("[DEBUG] Analizando contenido de la página...")
+            logger.info("Analizando contenido de la página...", extra={"evento": "analisis_pagina"})
             
             # Obtener el título de la página
             title = self.driver.title
-            print(f"[PAGE] Título de la página: {title}")
+            logger.info("Título de la página", extra={"evento": "analisis_pagina", "titulo": title})
             
             # Buscar texto que contenga "cumpleaños"
             birthday_elements = self.driver.find_elements(By.XPATH, "//*[contains(text(), 'cumpleaños') or contains(text(), 'cumpleañeros') or contains(text(), 'birthday')]")
             if birthday_elements:
-                print(f"[BIRTHDAY] Encontrados {len(birthday_elements)} elementos con texto de cumpleaños:")
+                logger.info("Elementos con texto de cumpleaños", extra={"evento": "analisis_pagina", "elementos": len(birthday_elements)})
                 for elem in birthday_elements[:3]:  # Solo mostrar los primeros 3
-                    print(f"  - {elem.text[:100]}...")
+                    logger.debug("Texto de cumpleaños encontrado", extra={"evento": "analisis_pagina", "texto": elem.text[:100]})
             
             # Buscar formularios
             forms = self.driver.find_elements(By.CSS_SELECTOR, "form")
-            print(f"[FORM] Encontrados {len(forms)} formularios")
+            logger.info("Formularios en la página", extra={"evento": "analisis_pagina", "formularios": len(forms)})
             
             # Buscar tablas
             tables = self.driver.find_elements(By.CSS_SELECTOR, "table")
-            print(f"[DATA] Encontradas {len(tables)} tablas HTML")
+            logger.info("Tablas HTML en la página", extra={"evento": "analisis_pagina", "tablas": len(tables)})
             
             # Buscar divs que puedan contener datos
             data_divs = self.driver.find_elements(By.CSS_SELECTOR, "div[class*='data'], div[class*='list'], div[class*='table']")
-            print(f"[LIST] Encontrados {len(data_divs)} divs potenciales de datos")
+            logger.info("Divs potenciales de datos", extra={"evento": "analisis_pagina", "divs": len(data_divs)})
             
             # Mostrar las primeras líneas del HTML para debug
             page_source = self.driver.page_source
             if "cumpleaños" in page_source.lower() or "cumpleañeros" in page_source.lower():
-                print("[OK] La página contiene texto relacionado con cumpleaños")
+                logger.info("La página contiene texto relacionado con cumpleaños", extra={"evento": "analisis_pagina"})
             else:
-                print("[WARNING] No se encontró texto relacionado con cumpleaños en la página")
+                logger.warning("No se encontró texto relacionado con cumpleaños en la página", extra={"evento": "analisis_pagina"})
                 
         except Exception as e:
-            print(f"[WARNING] Error en debug: {str(e)}")
+            logger.warning("Error en debug", extra={"evento": "analisis_pagina", "error": str(e)})
     
     def extract_birthday_data(self):
         """Extrae los datos de cumpleaños de la tabla"""
         try:
-            print("[INFO] Extrayendo datos de cumpleaños...")
+            logger.info("Extrayendo datos de cumpleaños...", extra={"evento": "extraccion_iniciando"})
             
             # Esperar un poco más para que la página cargue completamente
-            time.sleep(2)
+            self._sleep(2)
             
             # Buscar la tabla con selectores más específicos
             table_selectors = [
@@ -343,16 +1002,25 @@ class HermessBirthdayBot:
                 # Si no encontramos tabla, buscar por texto que contenga "cumpleaños"
                 try:
                     birthday_text = self.driver.find_element(By.XPATH, "//*[contains(text(), 'cumpleaños') or contains(text(), 'cumpleañeros')]")
-                    print(f"[FOUND] Encontrado texto relacionado: {birthday_text.text}")
+                    # El texto puede incluir la tabla de pacientes: en INFO solo su longitud
+                    texto = birthday_text.text
+                    logger.info("Encontrado texto relacionado", extra={
+                        "evento": "tabla_encontrada",
+                        "etiqueta": birthday_text.tag_name,
+                        "longitud_texto": len(texto)
+                    })
+                    logger.debug("Texto relacionado", extra={"evento": "tabla_encontrada", "texto": texto[:100]})
                     # Buscar el contenedor padre que pueda contener la tabla
                     table = birthday_text.find_element(By.XPATH, "./ancestor::div[contains(@class, 'container') or contains(@class, 'table') or contains(@class, 'list')]")
                 except:
                     pass
             
             if not table:
+                # Analizar la página solo cuando la extracción falla
+                self._debug_page_content()
                 raise Exception("No se pudo encontrar la tabla de cumpleaños")
             
-            print(f"[FOUND] Tabla encontrada con selector: {table.tag_name}")
+            logger.info("Tabla encontrada", extra={"evento": "tabla_encontrada", "etiqueta": table.tag_name})
             
             # Extraer filas de la tabla
             rows = table.find_elements(By.CSS_SELECTOR, "tr, [role='row'], div[class*='row']")
@@ -361,9 +1029,16 @@ class HermessBirthdayBot:
                 # Si no hay filas, buscar elementos que parezcan filas de datos
                 rows = table.find_elements(By.CSS_SELECTOR, "div[class*='item'], div[class*='entry'], div[class*='data']")
             
-            print(f"[FOUND] Encontradas {len(rows)} filas potenciales")
+            logger.info("Filas potenciales encontradas", extra={"evento": "filas_encontradas", "filas": len(rows)})
             
             birthdays_data = []
+            # Número de fila de la tabla de cada registro, para los reportes en bloque
+            filas_origen = []
+            
+            # Los eventos por fila se agregan en contadores; el detalle solo en nivel DEBUG
+            filas_descartadas = 0
+            filas_con_error = 0
+            log_filas = logger.isEnabledFor(logging.DEBUG)
             
             for i, row in enumerate(rows):
                 try:
@@ -379,17 +1054,42 @@ class HermessBirthdayBot:
                             birthday_entry = self._parse_birthday_row(cell_texts)
                             if birthday_entry:
                                 birthdays_data.append(birthday_entry)
-                                print(f"  [OK] Fila {i+1}: {birthday_entry['nombre']} - {birthday_entry['cumpleanos']}")
+                                filas_origen.append(i + 1)
+                                if log_filas:
+                                    logger.debug("Fila extraída", extra={
+                                        "evento": "fila_extraida",
+                                        "fila": i + 1,
+                                        "nombre": birthday_entry['nombre'],
+                                        "fecha_raw": birthday_entry['cumpleanos']
+                                    })
+                                continue
+                    
+                    filas_descartadas += 1
                         
                 except Exception as e:
-                    print(f"[WARNING] Error procesando fila {i+1}: {str(e)}")
+                    filas_con_error += 1
+                    if log_filas:
+                        logger.debug("Error procesando fila", extra={"evento": "fila_error", "fila": i + 1, "error": str(e)})
                     continue
             
-            print(f"[OK] Se extrajeron {len(birthdays_data)} registros de cumpleaños")
+            if filas_con_error:
+                logger.warning("Filas que no se pudieron procesar", extra={"evento": "filas_con_error", "filas": filas_con_error})
+            
+            # Convertir las fechas de todas las filas a la vez
+            self._normalize_birthday_data(birthdays_data, filas_origen)
+            
+            logger.info("Registros de cumpleaños extraídos", extra={
+                "evento": "extraccion_completada",
+                "registros": len(birthdays_data),
+                "filas_procesadas": len(rows),
+                "filas_descartadas": filas_descartadas,
+                "filas_con_error": filas_con_error,
+                "nombres_sin_formato": self.name_errors
+            })
             return birthdays_data
             
         except Exception as e:
-            print(f"[ERROR] Error extrayendo datos: {str(e)}")
+            logger.error("Error extrayendo datos", extra={"evento": "extraccion_error", "error": str(e)})
             return []
     
     def _contains_birthday_data(self, element):
@@ -402,55 +1102,53 @@ class HermessBirthdayBot:
             return False
     
     def _parse_birthday_row(self, cell_texts):
-        """Parsea una fila de datos de cumpleaños"""
-        try:
-            # Buscar patrones comunes en los datos
-            nombre = ""
-            fecha = ""
-            celular = ""
-            edad = ""
-            
-            for text in cell_texts:
-                text = text.strip()
-                if not text:
-                    continue
-                
-                # Identificar nombre (texto largo, sin números)
-                if len(text) > 5 and not any(char.isdigit() for char in text) and not nombre:
-                    nombre = text
-                
-                # Identificar fecha (formato DD/MM o similar)
-                elif '/' in text and len(text) <= 5 and not fecha:
-                    fecha = text
-                
-                # Identificar celular (10 dígitos)
-                elif text.isdigit() and len(text) == 10 and not celular:
-                    celular = text
-                
-                # Identificar edad (1-3 dígitos)
-                elif text.isdigit() and 1 <= len(text) <= 3 and not edad:
-                    edad = text
-            
-            # Solo retornar si tenemos al menos nombre y fecha
-            if nombre and fecha:
-                # Convertir fecha a formato compatible con n8n (solo año de ejecución)
-                cumpleanos = self._convert_date_to_n8n_format(fecha)
-                
-                # Formatear nombre con primera letra en mayúscula
-                nombre_formateado = self._format_name(nombre)
-                
-                return {
-                    "nombre": nombre_formateado,
-                    "cumpleanos": cumpleanos,
-                    "celular": celular,
-                    "edad": edad
-                }
-            
-            return None
-            
-        except Exception as e:
-            print(f"[WARNING] Error parseando fila: {str(e)}")
-            return None
+        """Parsea una fila de datos de cumpleaños
+        
+        Los errores se propagan a extract_birthday_data, que los cuenta en filas_con_error.
+        """
+        # Buscar patrones comunes en los datos
+        nombre = ""
+        fecha = ""
+        celular = ""
+        edad = ""
+        
+        for text in cell_texts:
+            text = text.strip()
+            if not text:
+                continue
+            
+            # Identificar nombre (texto largo, sin números)
+            if len(text) > 5 and not any(char.isdigit() for char in text) and not nombre:
+                nombre = text
+            
+            # Identificar fecha (formato DD/MM o similar)
+            elif '/' in text and len(text) <= 5 and not fecha:
+                fecha = text
+            
+            # Identificar celular (10 dígitos)
+            elif text.isdigit() and len(text) == 10 and not celular:
+                celular = text
+            
+            # Identificar edad (1-3 dígitos)
+            elif text.isdigit() and 1 <= len(text) <= 3 and not edad:
+                edad = text
+        
+        # Solo retornar si tenemos al menos nombre y fecha
+        if nombre and fecha:
+            # Formatear nombre con primera letra en mayúscula
+            nombre_formateado = self._format_name(nombre)
+            
+            # La fecha se convierte después, junto con el resto de filas
+            # (ver _normalize_birthday_data)
+            return {
+                "nombre": nombre_formateado,
+                "cumpleanos": fecha,
+                "celular": celular,
+                "edad": edad
+            }
+        
+        return None
+
     
     def _reorder_name(self, nombre):
         """Reordena el nombre de 'Apellido1 Apellido2 Nombre1 Nombre2' a 'Nombre1 Nombre2 Apellido1 Apellido2'"""
@@ -538,7 +1236,8 @@ class HermessBirthdayBot:
                 return f"{' '.join(nombres)} {' '.join(apellidos)}"
             
         except Exception as e:
-            print(f"[WARNING] Error reordenando nombre '{nombre}': {str(e)}")
+            self.name_errors += 1
+            logger.debug("Error reordenando nombre", extra={"evento": "nombre_error", "nombre": nombre, "error": str(e)})
             return nombre
     
     def _format_name(self, nombre):
@@ -565,35 +1264,43 @@ class HermessBirthdayBot:
             return " ".join(palabras_formateadas)
             
         except Exception as e:
-            print(f"[WARNING] Error formateando nombre '{nombre}': {str(e)}")
+            self.name_errors += 1
+            logger.debug("Error formateando nombre", extra={"evento": "nombre_error", "nombre": nombre, "error": str(e)})
             return nombre
     
-    def _convert_date_to_n8n_format(self, fecha_dd_mm):
-        """Convierte fecha DD/MM a formato YYYY-MM-DD usando siempre el año de ejecución"""
+    def _execution_year(self):
+        """Año de ejecución; al reproducir se usa el de la grabación para que sea determinista"""
+        if self.cassette_mode == 'replay' and self.cassette:
+            return self.cassette.recorded_at.year
+        return datetime.now().year
+    
+    def _normalize_birthday_data(self, data, filas=None):
+        """Convierte en lote las fechas de los registros extraídos al formato de n8n
+        
+        filas indica el número de fila de la tabla de cada registro; las fechas inválidas
+        se reportan con esos números para poder cruzarlas con los eventos por fila.
+        """
         try:
-            if '/' not in fecha_dd_mm:
-                return fecha_dd_mm
-            
-            # Separar día y mes
-            partes = fecha_dd_mm.split('/')
-            if len(partes) != 2:
-                return fecha_dd_mm
-            
-            dia = int(partes[0])
-            mes = int(partes[1])
-            
-            # Siempre usar el año de ejecución del script
-            año_ejecucion = datetime.now().year
+            fechas, invalidas = normalize_birthday_dates(
+                [entry["cumpleanos"] for entry in data],
+                year=self._execution_year()
+            )
             
-            # Crear fecha completa con el año de ejecución
-            fecha_completa = datetime(año_ejecucion, mes, dia)
+            for entry, fecha in zip(data, fechas):
+                entry["cumpleanos"] = fecha
             
-            # Formato ISO 8601 (YYYY-MM-DD) compatible con n8n
-            return fecha_completa.strftime("%Y-%m-%d")
+            # Reportar las fechas inválidas en bloque, no una advertencia por fila
+            if invalidas:
+                logger.warning("Registros con fecha inválida", extra={
+                    "evento": "fechas_invalidas",
+                    "registros": len(invalidas),
+                    "filas": [filas[i] if filas else i + 1 for i in invalidas[:10]]
+                })
             
         except Exception as e:
-            print(f"[WARNING] Error convirtiendo fecha {fecha_dd_mm}: {str(e)}")
-            return fecha_dd_mm
+            logger.warning("Error normalizando fechas", extra={"evento": "fechas_error", "error": str(e)})
+        
+        return data
     
     def _remove_duplicates(self, data):
         """Elimina registros duplicados basados en nombre y celular"""
@@ -611,15 +1318,16 @@ class HermessBirthdayBot:
                     unique_data.append(entry)
                 else:
                     duplicates_removed += 1
-                    print(f"[INFO] Duplicado eliminado: {entry.get('nombre', 'Sin nombre')}")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Duplicado eliminado", extra={"evento": "duplicado_eliminado", "nombre": entry.get('nombre', 'Sin nombre')})
             
             if duplicates_removed > 0:
-                print(f"[OK] Se eliminaron {duplicates_removed} registros duplicados")
+                logger.info("Registros duplicados eliminados", extra={"evento": "duplicados_eliminados", "registros": duplicates_removed})
             
             return unique_data
             
         except Exception as e:
-            print(f"[WARNING] Error eliminando duplicados: {str(e)}")
+            logger.warning("Error eliminando duplicados", extra={"evento": "duplicados_error", "error": str(e)})
             return data
     
     def send_to_n8n_webhook(self, data):
@@ -634,7 +1342,7 @@ class HermessBirthdayBot:
                     "fecha_extraccion": datetime.now().isoformat(),
                     "total_registros": len(data_unique),
                     "formato_fecha": "YYYY-MM-DD",
-                    "año_ejecucion": datetime.now().year,
+                    "año_ejecucion": self._execution_year(),
                     "fuente": "HermessApp",
                     "descripcion": "Lista de cumpleaños de pacientes extraída automáticamente"
                 },
@@ -656,48 +1364,68 @@ class HermessBirthdayBot:
                 'User-Agent': user_agent
             }
             
-            print(f"[INFO] Enviando datos al webhook de n8n...")
-            print(f"[DATA] Total de registros únicos: {len(data_unique)}")
-            print(f"[WEB] URL del webhook: {self.n8n_webhook_url}")
-            print(f"[WEB] User-Agent: {user_agent}")
+            logger.info("Enviando datos al webhook de n8n...", extra={
+                "evento": "webhook_enviando",
+                "registros": len(data_unique),
+                "url": self.n8n_webhook_url,
+                "user_agent": user_agent
+            })
             
             # Enviar petición POST al webhook
-            response = requests.post(
-                self.n8n_webhook_url,
-                json=payload,
-                headers=headers,
-                timeout=30
-            )
+            response = self._post_webhook(payload, headers)
             
             # Verificar respuesta
             if response.status_code == 200:
-                print(f"[OK] Datos enviados exitosamente al webhook de n8n")
-                print(f"[DATA] Total de registros enviados: {len(data_unique)}")
-                print(f"[DATE] Formato de fecha: YYYY-MM-DD")
-                print(f"[DATE] Año de ejecución: {datetime.now().year}")
+                logger.info("Datos enviados exitosamente al webhook de n8n", extra={
+                    "evento": "webhook_enviado",
+                    "registros": len(data_unique),
+                    "formato_fecha": "YYYY-MM-DD",
+                    "año_ejecucion": self._execution_year()
+                })
                 return True
             else:
-                print(f"[ERROR] Error enviando datos al webhook. Código de respuesta: {response.status_code}")
-                print(f"[PAGE] Respuesta del servidor: {response.text}")
+                logger.error("Error enviando datos al webhook", extra={
+                    "evento": "webhook_error",
+                    "codigo_respuesta": response.status_code
+                })
+                # La respuesta puede repetir los datos enviados: solo en DEBUG
+                logger.debug("Respuesta del servidor", extra={"evento": "webhook_error", "respuesta": response.text[:500]})
                 return False
                 
         except requests.exceptions.Timeout:
-            print(f"[ERROR] Timeout al enviar datos al webhook de n8n")
+            logger.error("Timeout al enviar datos al webhook de n8n", extra={"evento": "webhook_error"})
             return False
         except requests.exceptions.ConnectionError:
-            print(f"[ERROR] Error de conexión al webhook de n8n")
+            logger.error("Error de conexión al webhook de n8n", extra={"evento": "webhook_error"})
             return False
         except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Error enviando datos al webhook: {str(e)}")
+            logger.error("Error enviando datos al webhook", extra={"evento": "webhook_error", "error": str(e)})
             return False
         except Exception as e:
-            print(f"[ERROR] Error inesperado enviando datos: {str(e)}")
+            logger.error("Error inesperado enviando datos", extra={"evento": "webhook_error", "error": str(e)})
             return False
     
+    def _post_webhook(self, payload, headers):
+        """Hace el POST al webhook, grabándolo o reproduciéndolo según el modo"""
+        if self.cassette_mode == 'replay':
+            return self.cassette.replay_webhook(payload)
+        
+        response = requests.post(
+            self.n8n_webhook_url,
+            json=payload,
+            headers=headers,
+            timeout=30
+        )
+        
+        if self.cassette_mode == 'record' and self.cassette:
+            self.cassette.record_webhook(self.n8n_webhook_url, payload, response)
+        
+        return response
+    
     def run(self):
         """Ejecuta el bot completo"""
         try:
-            print("[START] Iniciando bot de HermessApp...")
+            logger.info("Iniciando bot de HermessApp...", extra={"evento": "bot_iniciando"})
             
             self.setup_driver()
             
@@ -712,41 +1440,56 @@ class HermessBirthdayBot:
             if birthdays_data:
                 success = self.send_to_n8n_webhook(birthdays_data)
                 if success:
-                    print(f"[SUCCESS] Datos enviados exitosamente al webhook de n8n")
+                    logger.info("Datos enviados exitosamente al webhook de n8n", extra={"evento": "bot_completado", "registros": len(birthdays_data)})
                     return birthdays_data
                 else:
-                    print("[ERROR] Error enviando datos al webhook")
+                    logger.error("Error enviando datos al webhook", extra={"evento": "bot_fallido"})
                     return None
             else:
-                print("[ERROR] No se pudieron extraer datos")
+                logger.error("No se pudieron extraer datos", extra={"evento": "bot_fallido"})
                 return None
                 
         except Exception as e:
-            print(f"[ERROR] Error general: {str(e)}")
+            logger.error("Error general", extra={"evento": "bot_error", "error": str(e)})
             return None
             
         finally:
             if self.driver:
                 self.driver.quit()
-                print("[CLOSE] Navegador cerrado")
+                logger.info("Navegador cerrado", extra={"evento": "navegador_cerrado"})
+            if self.tracer:
+                self.tracer.log_summary()
+            if self.cassette_mode == 'record' and self.cassette:
+                self.cassette.save()
 
 def main():
     """Función principal"""
+    setup_logging()
     try:
         bot = HermessBirthdayBot()
-        result = bot.run()
+        if bot.profile_mode:
+            result = run_with_profiler(bot.run, bot.profile_mode, bot.profile_output)
+        else:
+            result = bot.run()
         
         if result:
-            print(f"\n[SUCCESS] Bot ejecutado exitosamente!")
-            print(f"[DATA] Total de registros extraídos: {len(result)}")
-            print("\n[LIST] Primeros 3 registros:")
+            logger.info("Bot ejecutado exitosamente", extra={"evento": "ejecucion_exitosa", "registros": len(result)})
             for i, entry in enumerate(result[:3], 1):
-                print(f"  {i}. {entry['nombre']} - {entry['cumpleanos']} ({entry['edad']} años)")
+                logger.debug("Registro extraído", extra={
+                    "evento": "registro_extraido",
+                    "posicion": i,
+                    "nombre": entry['nombre'],
+                    "cumpleanos": entry['cumpleanos'],
+                    "edad": entry['edad']
+                })
         else:
-            print("\n[ERROR] El bot no pudo completar la tarea")
+            logger.error("El bot no pudo completar la tarea", extra={"evento": "ejecucion_fallida"})
             
     except Exception as e:
-        print(f"[ERROR] Error en la ejecución: {str(e)}")
+        logger.error("Error en la ejecución", extra={"evento": "ejecucion_error", "error": str(e)})
+    
+    finally:
+        shutdown_logging()
 
 if __name__ == "__main__":
     main()